@@ -4,12 +4,15 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
+import pandas as pd
 import streamlit as st
 
-from cluster_utils import CsvCluster
+from cluster_utils import CsvCluster, build_cluster_frame, build_search_index
 
 CLUSTERS_KEY = "clusters"
+CLUSTER_FRAME_KEY = "clusters_frame"
 CLUSTER_SOURCE_KEY = "clusters_source_signature"
+CLUSTER_DIGEST_KEY = "clusters_content_digest"
 
 FILTER_TYPES_KEY = "cluster_filter_selected_types"
 FILTER_CATEGORIES_KEY = "cluster_filter_selected_categories"
@@ -28,10 +31,21 @@ class FilterState:
     search_query: str
 
 
-def set_clusters(clusters: list[CsvCluster], source_signature: str) -> None:
-    """Persist clusters and their source signature in session state."""
+def set_clusters(
+    clusters: list[CsvCluster], source_signature: str, content_digest: str
+) -> None:
+    """Persist clusters, their source signature and content digest in session state.
+
+    Clusters are stored largest first; filtering preserves that order, so
+    filtered results never need sorting again.
+    """
+    clusters = sorted(clusters, key=lambda cluster: cluster.size, reverse=True)
     st.session_state[CLUSTERS_KEY] = clusters
+    st.session_state[CLUSTER_FRAME_KEY] = build_cluster_frame(
+        clusters, build_search_index(clusters)
+    )
     st.session_state[CLUSTER_SOURCE_KEY] = source_signature
+    st.session_state[CLUSTER_DIGEST_KEY] = content_digest
 
 
 def get_clusters() -> list[CsvCluster]:
@@ -39,15 +53,30 @@ def get_clusters() -> list[CsvCluster]:
     return st.session_state.get(CLUSTERS_KEY, [])
 
 
+def get_cluster_frame() -> pd.DataFrame:
+    """Retrieve the columnar filter view aligned with the clusters."""
+    frame = st.session_state.get(CLUSTER_FRAME_KEY)
+    if frame is None:
+        frame = build_cluster_frame([], [])
+    return frame
+
+
 def get_cluster_source_signature() -> str | None:
     """Return the signature of the currently-loaded cluster file."""
     return st.session_state.get(CLUSTER_SOURCE_KEY)
 
 
+def get_cluster_content_digest() -> str | None:
+    """Return the digest of the full contents of the loaded cluster file."""
+    return st.session_state.get(CLUSTER_DIGEST_KEY)
+
+
 def clear_clusters() -> None:
     """Remove clusters from session state."""
     st.session_state.pop(CLUSTERS_KEY, None)
+    st.session_state.pop(CLUSTER_FRAME_KEY, None)
     st.session_state.pop(CLUSTER_SOURCE_KEY, None)
+    st.session_state.pop(CLUSTER_DIGEST_KEY, None)
 
 
 def clear_filter_state() -> None:
@@ -72,10 +101,15 @@ def ensure_filter_state(clusters: list[CsvCluster]) -> FilterState:
     if not clusters:
         return FilterState([], [], [], [], 1, 1, "")
 
-    type_options = sorted({cluster.criterion_type or "—" for cluster in clusters})
-    category_options = sorted({cluster.parsed_category or "—" for cluster in clusters})
-    max_cluster_size = max((cluster.size for cluster in clusters), default=1)
-    max_cluster_size = max(1, max_cluster_size)
+    types: set[str] = set()
+    categories: set[str] = set()
+    max_cluster_size = 1
+    for cluster in clusters:
+        types.add(cluster.criterion_type or "—")
+        categories.add(cluster.parsed_category or "—")
+        max_cluster_size = max(max_cluster_size, cluster.size)
+    type_options = sorted(types)
+    category_options = sorted(categories)
 
     selected_types = _read_list_state(FILTER_TYPES_KEY, type_options)
     selected_categories = _read_list_state(FILTER_CATEGORIES_KEY, category_options)
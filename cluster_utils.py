@@ -3,11 +3,20 @@
 from __future__ import annotations
 
 import csv
+import re
 from collections.abc import Iterable
 from dataclasses import dataclass
 from io import StringIO, TextIOBase
 from itertools import zip_longest
 
+import pandas as pd
+
+_LIST_SEPARATOR_RE = re.compile(r"\s*,\s*")
+_LIST_ITEM_QUOTES = "\"'"
+
+# Unit separator: never typed into the search box, so it bounds haystack fields.
+SEARCH_FIELD_SEPARATOR = "\x1f"
+
 
 @dataclass(frozen=True)
 class CsvCluster:
@@ -30,38 +39,84 @@ def split_field(value: str | None) -> list[str]:
 
     value = value.strip()
     if value.startswith("[") and value.endswith("]"):
-        items = value[1:-1].split(",")
-        return [item.strip().strip('"').strip("'") for item in items if item.strip()]
+        body = value[1:-1].strip()
+        return [
+            item.strip(_LIST_ITEM_QUOTES)
+            for item in _LIST_SEPARATOR_RE.split(body)
+            if item
+        ]
 
     lines = [part.strip() for part in value.replace("\r", "").split("\n")]
     return [line for line in lines if line]
 
 
+_COLUMN_ALIASES: dict[str, tuple[str, str]] = {
+    "cluster_id": ("Cluster ID", "id"),
+    "criterion_type": ("Type", "type"),
+    "parsed_category": ("Category", "parsed_category"),
+    "representative_code": ("Representative Code", "representative_code"),
+    "representative_text": ("Representative Text", "representative_text"),
+    "size": ("Size", "size"),
+    "codes": ("Codes", "codes"),
+    "trials": ("Trials", "nct_ids"),
+}
+
+
+def _resolve_columns(header: list[str]) -> dict[str, int]:
+    """Map each cluster field to its column index in the CSV header.
+
+    Fields missing from the header map to ``len(header)``, the blank cell that
+    ``load_clusters_from_csv`` appends to every row.
+    """
+    positions = {name: index for index, name in enumerate(header)}
+    missing = len(header)
+    return {
+        field: positions.get(canonical, positions.get(alias, missing))
+        for field, (canonical, alias) in _COLUMN_ALIASES.items()
+    }
+
+
 def load_clusters_from_csv(file_buffer: TextIOBase) -> list[CsvCluster]:
     """Load clusters from a CSV file-like object."""
-    reader = csv.DictReader(file_buffer)
-    clusters: list[CsvCluster] = []
+    reader = csv.reader(file_buffer)
+    header = next(reader, None)
+    if header is None:
+        return []
 
+    width = len(header)
+    columns = _resolve_columns(header)
+    id_idx = columns["cluster_id"]
+    type_idx = columns["criterion_type"]
+    category_idx = columns["parsed_category"]
+    code_idx = columns["representative_code"]
+    text_idx = columns["representative_text"]
+    size_idx = columns["size"]
+    codes_idx = columns["codes"]
+    trials_idx = columns["trials"]
+
+    # Types and categories repeat across rows; share one string object per value.
+    interned: dict[str, str] = {}
+
+    clusters: list[CsvCluster] = []
     for row in reader:
-        codes = split_field(row.get("Codes", row.get("codes")))
-        trials = split_field(row.get("Trials", row.get("nct_ids")))
+        if not row:
+            continue
+        if len(row) != width:
+            row = row[:width] + [""] * (width - len(row))
+        row.append("")
+
+        codes = split_field(row[codes_idx])
+        trials = split_field(row[trials_idx])
+        criterion_type = interned.setdefault(row[type_idx], row[type_idx])
+        parsed_category = interned.setdefault(row[category_idx], row[category_idx])
         clusters.append(
             CsvCluster(
-                cluster_id=int(row.get("Cluster ID", row.get("id", "0")) or 0),
-                criterion_type=row.get("Type", row.get("type", "")) or "",
-                parsed_category=row.get("Category", row.get("parsed_category", ""))
-                or "",
-                representative_code=row.get(
-                    "Representative Code",
-                    row.get("representative_code", ""),
-                )
-                or "",
-                representative_text=row.get(
-                    "Representative Text",
-                    row.get("representative_text", ""),
-                )
-                or "",
-                size=int(row.get("Size", row.get("size", "0")) or 0),
+                cluster_id=int(row[id_idx] or 0),
+                criterion_type=criterion_type,
+                parsed_category=parsed_category,
+                representative_code=row[code_idx],
+                representative_text=row[text_idx],
+                size=int(row[size_idx] or 0),
                 codes_count=len(codes),
                 trials_count=len(trials),
                 codes=codes,
@@ -87,18 +142,51 @@ def render_metrics(clusters: Iterable[CsvCluster]) -> None:
     col3.metric("Multi-member Clusters", multi_member)
 
 
-def cluster_matches_search(cluster: CsvCluster, query: str) -> bool:
-    """Check whether the cluster matches the lower-cased search query."""
-    if not query:
-        return True
+def build_search_index(clusters: Iterable[CsvCluster]) -> list[bytes]:
+    """Precompute one case-folded, UTF-8 encoded search haystack per cluster.
 
-    haystacks = [
-        cluster.representative_text.lower(),
-        cluster.representative_code.lower(),
-        " ".join(cluster.codes).lower(),
-        " ".join(cluster.trials).lower(),
+    Fields are ordered shortest first so a substring scan, which stops at the
+    first hit, reaches matches on the representative code or text early. The
+    four fields are separated by ``SEARCH_FIELD_SEPARATOR`` so a query cannot
+    match across two of them, while codes and trials stay space-joined within
+    their field. Matching on UTF-8 bytes is equivalent to matching the text and
+    avoids wide-string comparisons for non-ASCII content.
+    """
+    return [
+        SEARCH_FIELD_SEPARATOR.join(
+            [
+                cluster.representative_code,
+                cluster.representative_text,
+                " ".join(cluster.codes),
+                " ".join(cluster.trials),
+            ]
+        )
+        .casefold()
+        .encode("utf-8")
+        for cluster in clusters
     ]
-    return any(query in haystack for haystack in haystacks)
+
+
+def build_cluster_frame(
+    clusters: list[CsvCluster], search_index: list[bytes]
+) -> pd.DataFrame:
+    """Build the columnar view of the clusters used for vectorized filtering.
+
+    Rows are positionally aligned with ``clusters``.
+    """
+    return pd.DataFrame(
+        {
+            "cluster_id": [cluster.cluster_id for cluster in clusters],
+            "type_lc": [
+                (cluster.criterion_type or "—").lower() for cluster in clusters
+            ],
+            "cat_lc": [
+                (cluster.parsed_category or "—").lower() for cluster in clusters
+            ],
+            "size": [cluster.size for cluster in clusters],
+            "haystack": search_index,
+        }
+    )
 
 
 def cluster_to_row(
@@ -125,6 +213,33 @@ def cluster_to_row(
     return row
 
 
+def clusters_to_dataframe(
+    clusters: list[CsvCluster], *, include_details: bool
+) -> pd.DataFrame:
+    """Build the display table for clusters column by column.
+
+    Produces the same columns and values as ``cluster_to_row``.
+    """
+    columns: dict[str, list[str | int]] = {
+        "Cluster ID": [cluster.cluster_id for cluster in clusters],
+        "Type": [cluster.criterion_type or "—" for cluster in clusters],
+        "Category": [cluster.parsed_category or "—" for cluster in clusters],
+        "Representative Code": [
+            cluster.representative_code or "—" for cluster in clusters
+        ],
+        "Representative Text": [cluster.representative_text for cluster in clusters],
+        "Size": [cluster.size for cluster in clusters],
+        "# Codes": [cluster.codes_count for cluster in clusters],
+        "# Trials": [cluster.trials_count for cluster in clusters],
+    }
+
+    if include_details:
+        columns["Codes"] = ["\n".join(cluster.codes) or "—" for cluster in clusters]
+        columns["Trials"] = ["\n".join(cluster.trials) or "—" for cluster in clusters]
+
+    return pd.DataFrame(columns)
+
+
 def rows_to_csv(rows: list[dict[str, str | int]]) -> bytes:
     """Convert a list of table row dicts into CSV bytes."""
     if not rows:
@@ -132,45 +247,41 @@ def rows_to_csv(rows: list[dict[str, str | int]]) -> bytes:
 
     fieldnames = list(rows[0].keys())
     buffer = StringIO()
-    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
-    writer.writeheader()
-    writer.writerows(rows)
+    writer = csv.writer(buffer)
+    writer.writerow(fieldnames)
+    writer.writerows([row[field] for field in fieldnames] for row in rows)
     return buffer.getvalue().encode("utf-8")
 
 
-def sort_clusters_by_size(clusters: Iterable[CsvCluster]) -> list[CsvCluster]:
-    """Return clusters ordered by descending size."""
-    return sorted(clusters, key=lambda cluster: cluster.size, reverse=True)
-
-
 def filter_clusters(
-    clusters: Iterable[CsvCluster],
+    cluster_frame: pd.DataFrame,
     *,
     selected_types: Iterable[str],
     selected_categories: Iterable[str],
     min_cluster_size: int,
     search_query: str,
-) -> list[CsvCluster]:
-    """Filter clusters according to the configured controls."""
+) -> list[int]:
+    """Return positions of the clusters matching the configured controls.
+
+    ``cluster_frame`` comes from ``build_cluster_frame``; the returned
+    positions index into the cluster list it was built from.
+    """
     selected_types = {item.lower() for item in selected_types}
     selected_categories = {item.lower() for item in selected_categories}
-    query = search_query.strip().lower()
-
-    filtered: list[CsvCluster] = []
-    for cluster in clusters:
-        cluster_type = (cluster.criterion_type or "—").lower()
-        cluster_category = (cluster.parsed_category or "—").lower()
-        if cluster_type not in selected_types:
-            continue
-        if cluster_category not in selected_categories:
-            continue
-        if cluster.size < min_cluster_size:
-            continue
-        if query and not cluster_matches_search(cluster, query):
-            continue
-        filtered.append(cluster)
-
-    return filtered
+    needle = search_query.strip().casefold().encode("utf-8")
+
+    mask = (
+        cluster_frame["type_lc"].isin(selected_types)
+        & cluster_frame["cat_lc"].isin(selected_categories)
+        & (cluster_frame["size"] >= min_cluster_size)
+    )
+    positions = mask.to_numpy().nonzero()[0].tolist()
+    if not needle:
+        return positions
+
+    # Only scan haystacks of rows that already passed the cheap predicates.
+    haystacks = cluster_frame["haystack"].to_numpy()
+    return [position for position in positions if needle in haystacks[position]]
 
 
 def paired_codes_trials(cluster: CsvCluster) -> list[tuple[str, str]]:
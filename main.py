@@ -4,11 +4,12 @@ from __future__ import annotations
 
 import streamlit as st
 
-from cluster_state import get_cluster_source_signature, get_clusters
-from streamlit_utils import create_db_and_tables
+from streamlit_utils import ensure_schema
 
 
 def main() -> None:
+    ensure_schema()
+
     # st.set_page_config(page_title="Eligibility Clusters Explorer", layout="wide")
     # st.title("Eligibility Clusters Explorer")
 
@@ -51,6 +51,15 @@ class ParsedEligibilityCriteria(SQLModel, table=True):
 
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
+    __table_args__ = (
+        Index(
+            "idx_eligibility_criteria_parsed_nct_active_version",
+            "nct_id",
+            "is_active",
+            "version",
+        ),
+    )
+
 
 class CriteriaChangeHistory(SQLModel, table=True):
     """Track all changes made to criteria during refinement."""
@@ -68,4 +77,9 @@ class CriteriaChangeHistory(SQLModel, table=True):
     __table_args__ = (
         Index("idx_criteria_change_history_criterion", "criterion_id"),
         Index("idx_criteria_change_history_type", "change_type"),
+        Index(
+            "idx_criteria_change_history_criterion_changed",
+            "criterion_id",
+            "changed_at",
+        ),
     )
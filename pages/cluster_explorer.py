@@ -4,8 +4,10 @@ from __future__ import annotations
 
 import csv
 import hashlib
-from io import StringIO
+from io import BytesIO, TextIOWrapper
+from itertools import islice
 
+import pandas as pd
 import streamlit as st
 
 from cluster_state import (
@@ -17,45 +19,111 @@ from cluster_state import (
     clear_clusters,
     clear_filter_state,
     ensure_filter_state,
+    get_cluster_content_digest,
+    get_cluster_frame,
     get_cluster_source_signature,
     get_clusters,
     set_clusters,
 )
 from cluster_utils import (
+    CsvCluster,
     cluster_to_row,
+    clusters_to_dataframe,
     filter_clusters,
     load_clusters_from_csv,
     paired_codes_trials,
     render_metrics,
     rows_to_csv,
-    sort_clusters_by_size,
 )
 
+SIGNATURE_PREFIX_BYTES = 64 * 1024
+PARSED_UPLOADS_CACHE_MAX_ENTRIES = 4
+FILTERED_IDS_CACHE_MAX_ENTRIES = 128
+FILTERED_CSV_CACHE_MAX_ENTRIES = 16
+
 
 def _compute_signature(
     uploaded_file: "st.runtime.uploaded_file_manager.UploadedFile",
 ) -> str:
-    """Create a stable signature for identifying an uploaded file."""
-    file_bytes = uploaded_file.getvalue()
-    digest = hashlib.sha256(file_bytes).hexdigest()
+    """Create a stable signature for identifying an uploaded file.
+
+    Only the first ``SIGNATURE_PREFIX_BYTES`` are hashed; together with the
+    name and size this is enough to tell uploads apart.
+    """
+    prefix = uploaded_file.getbuffer()[:SIGNATURE_PREFIX_BYTES].tobytes()
+    digest = hashlib.blake2b(prefix, digest_size=16).hexdigest()
     return f"{uploaded_file.name}:{uploaded_file.size}:{digest}"
 
 
+@st.cache_data(show_spinner=False, max_entries=PARSED_UPLOADS_CACHE_MAX_ENTRIES)
+def _parse_clusters(raw_bytes: bytes) -> tuple[list[CsvCluster], str]:
+    """Parse uploaded CSV bytes into clusters, cached on the file contents.
+
+    Also returns a digest of the full contents, which keys the process-wide
+    filter caches below. Each entry holds a whole parsed file, so only a few
+    recent uploads are kept.
+    """
+    digest = hashlib.blake2b(raw_bytes, digest_size=16).hexdigest()
+    with TextIOWrapper(BytesIO(raw_bytes), encoding="utf-8", newline="") as buffer:
+        return load_clusters_from_csv(buffer), digest
+
+
 def _load_uploaded_clusters(
     uploaded_file: "st.runtime.uploaded_file_manager.UploadedFile",
-) -> list:
-    """Decode the uploaded CSV into clusters."""
+) -> tuple[list[CsvCluster], str]:
+    """Decode the uploaded CSV into clusters and a content digest."""
     try:
-        text_buffer = StringIO(uploaded_file.getvalue().decode("utf-8"))
+        return _parse_clusters(uploaded_file.getvalue())
     except UnicodeDecodeError as exc:  # pragma: no cover - streamlit runtime
         st.error(f"Unable to decode `{uploaded_file.name}` as UTF-8: {exc}")
-        return []
-
-    try:
-        return load_clusters_from_csv(text_buffer)
+        return [], ""
     except csv.Error as exc:  # pragma: no cover - streamlit runtime
         st.error(f"Failed to parse `{uploaded_file.name}`: {exc}")
-        return []
+        return [], ""
+
+
+@st.cache_data(show_spinner=False, max_entries=FILTERED_IDS_CACHE_MAX_ENTRIES)
+def _compute_filtered(
+    _cluster_frame: pd.DataFrame,
+    content_digest: str,
+    selected_types: tuple[str, ...],
+    selected_categories: tuple[str, ...],
+    min_cluster_size: int,
+    search_query: str,
+) -> list[int]:
+    """Return positions of the matching clusters in their stored, largest-first order.
+
+    Cached on the full content digest and filter values; the frame itself is
+    excluded from hashing.
+    """
+    positions = filter_clusters(
+        _cluster_frame,
+        selected_types=selected_types,
+        selected_categories=selected_categories,
+        min_cluster_size=min_cluster_size,
+        search_query=search_query,
+    )
+    return positions
+
+
+@st.cache_data(show_spinner=False, max_entries=FILTERED_CSV_CACHE_MAX_ENTRIES)
+def _build_filtered_csv(
+    _clusters: list[CsvCluster],
+    content_digest: str,
+    positions: tuple[int, ...],
+) -> bytes:
+    """Serialize the filtered clusters with full details for download.
+
+    Cached on the full content digest and the ordered positions into the stored
+    clusters; only a few recent results are kept since each holds a full-detail
+    CSV.
+    """
+    return rows_to_csv(
+        [
+            cluster_to_row(_clusters[position], include_details=True)
+            for position in positions
+        ]
+    )
 
 
 def _render_filters(
@@ -110,20 +178,22 @@ def _render_filters(
     )
 
 
-def _render_table(filtered_clusters: list) -> None:
-    """Render the filtered table and download button."""
-    ordered_clusters = sort_clusters_by_size(filtered_clusters)
+def _render_table(
+    ordered_clusters: list[CsvCluster],
+    clusters: list[CsvCluster],
+    positions: list[int],
+    content_digest: str,
+) -> None:
+    """Render the size-ordered filtered table and download button."""
     detailed_view = bool(st.session_state.get("explorer_show_details", False))
 
-    table_rows = [
-        cluster_to_row(cluster, include_details=detailed_view)
-        for cluster in ordered_clusters
-    ]
-
-    st.dataframe(table_rows, hide_index=True, use_container_width=True)
+    table = clusters_to_dataframe(ordered_clusters, include_details=detailed_view)
+    st.dataframe(table, hide_index=True, use_container_width=True)
 
-    filtered_csv = rows_to_csv(
-        [cluster_to_row(cluster, include_details=True) for cluster in ordered_clusters]
+    filtered_csv = _build_filtered_csv(
+        clusters,
+        content_digest,
+        tuple(positions),
     )
     st.download_button(
         "Download filtered clusters (CSV)",
@@ -134,9 +204,8 @@ def _render_table(filtered_clusters: list) -> None:
     )
 
 
-def _render_details(filtered_clusters: list) -> None:
-    """Render expandable detail sections for the filtered clusters."""
-    ordered_clusters = sort_clusters_by_size(filtered_clusters)
+def _render_details(ordered_clusters: list[CsvCluster]) -> None:
+    """Render expandable detail sections for the size-ordered clusters."""
     default_limit = min(25, len(ordered_clusters))
 
     limit_key = "explorer_details_limit"
@@ -153,21 +222,27 @@ def _render_details(filtered_clusters: list) -> None:
         key=limit_key,
     )
 
-    for cluster in ordered_clusters[: int(limit)]:
+    for cluster in islice(ordered_clusters, int(limit)):
         header = (
             f"[{(cluster.criterion_type or '—').upper()}] "
             f"{cluster.representative_text} (size {cluster.size})"
         )
         with st.expander(header):
             st.markdown(
-                f"**Representative code:** `{cluster.representative_code or '-'}'"
+                f"**Representative code:** `{cluster.representative_code or '-'}`  \n"
+                f"**Category:** {cluster.parsed_category or '—'}  \n"
+                f"**Total criteria:** {cluster.size}"
             )
-            st.markdown(f"**Category:** {cluster.parsed_category or '—'}")
-            st.markdown(f"**Total criteria:** {cluster.size}")
             st.divider()
 
-            for idx, (code, trial) in enumerate(paired_codes_trials(cluster), start=1):
-                st.markdown(f"{idx}. `{code}` — {trial}")
+            pairs = paired_codes_trials(cluster)
+            if pairs:
+                st.markdown(
+                    "\n".join(
+                        f"{idx}. `{code}` — {trial}"
+                        for idx, (code, trial) in enumerate(pairs, start=1)
+                    )
+                )
 
 
 def main() -> None:
@@ -185,9 +260,9 @@ def main() -> None:
     if uploaded is not None:
         signature = _compute_signature(uploaded)
         if signature != get_cluster_source_signature():
-            clusters = _load_uploaded_clusters(uploaded)
+            clusters, content_digest = _load_uploaded_clusters(uploaded)
             if clusters:
-                set_clusters(clusters, signature)
+                set_clusters(clusters, signature, content_digest)
                 clear_filter_state()
                 ensure_filter_state(clusters)
                 st.success(
@@ -222,13 +297,17 @@ def main() -> None:
         _,
     ) = _render_filters(filter_state)
 
-    filtered_clusters = filter_clusters(
-        clusters,
-        selected_types=selected_types,
-        selected_categories=selected_categories,
-        min_cluster_size=min_cluster_size,
-        search_query=search_query,
+    content_digest = get_cluster_content_digest() or ""
+    # The frame rows are aligned with the stored clusters, so positions index them
+    filtered_positions = _compute_filtered(
+        get_cluster_frame(),
+        content_digest,
+        tuple(sorted(selected_types)),
+        tuple(sorted(selected_categories)),
+        min_cluster_size,
+        search_query.strip().casefold(),
     )
+    filtered_clusters = [clusters[position] for position in filtered_positions]
 
     st.subheader("Filtered Summary")
     render_metrics(filtered_clusters)
@@ -238,7 +317,7 @@ def main() -> None:
         st.stop()
 
     st.subheader("Filtered Table")
-    _render_table(filtered_clusters)
+    _render_table(filtered_clusters, clusters, filtered_positions, content_digest)
 
     st.subheader("Cluster Details")
     _render_details(filtered_clusters)
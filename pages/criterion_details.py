@@ -6,6 +6,7 @@ import streamlit as st
 from streamlit_utils import (
     load_criterion_history,
     render_field_diff,
+    sync_query_params,
 )
 
 st.set_page_config(page_title="Criterion Details", layout="wide")
@@ -14,8 +15,10 @@ st.set_page_config(page_title="Criterion Details", layout="wide")
 query_params = st.query_params
 criterion_id_from_url = query_params.get("criterion_id")
 
-if query_params.get("page") != "criterion_details":
-    query_params["page"] = "criterion_details"
+# URL state for this page, written once via sync_query_params
+url_state = {"page": "criterion_details"}
+if criterion_id_from_url:
+    url_state["criterion_id"] = criterion_id_from_url
 
 # Back button
 col1, col2 = st.columns([1, 5])
@@ -51,10 +54,10 @@ if st.button("Load Criterion") or auto_load:
 
     if not criterion:
         st.error(f"Criterion {criterion_id} not found")
+        sync_query_params(url_state)
         st.stop()
 
-    if query_params.get("criterion_id") != str(criterion_id):
-        query_params["criterion_id"] = str(criterion_id)
+    url_state["criterion_id"] = str(criterion_id)
 
     # Display criterion details
     st.subheader(f"Criterion {criterion.id}")
@@ -92,18 +95,18 @@ if st.button("Load Criterion") or auto_load:
 
         for i, change in enumerate(changes, 1):
             with st.expander(
-                f"{i}. {change.change_type.upper()} at {change.changed_at}",
+                f"{i}. {change['change_type'].upper()} at {change['changed_at']}",
                 expanded=i == 1,
             ):
-                if change.reason:
-                    st.info(f"**Reason:** {change.reason}")
+                if change["reason"]:
+                    st.info(f"**Reason:** {change['reason']}")
 
                 # Render GitHub-style diff for common fields
-                if change.old_value and change.new_value:
+                if change["old_value"] and change["new_value"]:
                     # Show diffs for text, code, and category fields
                     for field in ["text", "code", "parsed_category"]:
                         diff_html = render_field_diff(
-                            change.old_value, change.new_value, field
+                            change["old_value"], change["new_value"], field
                         )
                         if diff_html:
                             st.markdown(f"**{field.replace('_', ' ').title()}:**")
@@ -114,27 +117,27 @@ if st.button("Load Criterion") or auto_load:
                         col1, col2 = st.columns(2)
                         with col1:
                             st.markdown("**Old Value:**")
-                            st.json(change.old_value)
+                            st.json(change["old_value"])
                         with col2:
                             st.markdown("**New Value:**")
-                            st.json(change.new_value)
+                            st.json(change["new_value"])
                 else:
                     # Fallback to old display if only one value exists
                     col1, col2 = st.columns(2)
                     with col1:
-                        if change.old_value:
+                        if change["old_value"]:
                             st.markdown("**Old Value:**")
                             try:
-                                st.json(change.old_value)
+                                st.json(change["old_value"])
                             except Exception:
-                                st.code(str(change.old_value))
+                                st.code(str(change["old_value"]))
                     with col2:
-                        if change.new_value:
+                        if change["new_value"]:
                             st.markdown("**New Value:**")
                             try:
-                                st.json(change.new_value)
+                                st.json(change["new_value"])
                             except Exception:
-                                st.code(str(change.new_value))
+                                st.code(str(change["new_value"]))
     else:
         st.info("No change history available")
 
@@ -144,18 +147,9 @@ if st.button("Load Criterion") or auto_load:
         st.markdown("### Children (Split Results)")
 
         children_df = pd.DataFrame(
-            [
-                {
-                    "ID": child.id,
-                    "Code": child.code,
-                    "Text": child.text,
-                    "Category": child.parsed_category,
-                    "Version": child.version,
-                    "Active": "✅" if child.is_active else "❌",
-                }
-                for child in children
-            ]
+            children, columns=["ID", "Code", "Text", "Category", "Version", "Active"]
         )
+        children_df["Active"] = children_df["Active"].map({True: "✅", False: "❌"})
         st.dataframe(
             children_df,
             width="stretch",
@@ -177,3 +171,5 @@ if st.button("Load Criterion") or auto_load:
 
 st.markdown("---")
 st.caption("💡 Tip: Use the back button to return to the trial overview")
+
+sync_query_params(url_state)
@@ -1,22 +1,40 @@
 """Trial Overview page - Browse and filter criteria by trial."""
 
+import html
+import math
+import time
+from collections import Counter
+from operator import itemgetter
+
 import pandas as pd
 import streamlit as st
 
 from streamlit_utils import (
+    CACHE_TTL_SECONDS,
+    HISTORY_PREVIEW_LIMIT,
     load_criteria,
+    load_trial_stats,
     load_trials,
     render_field_diff,
+    sync_query_params,
 )
 
 st.set_page_config(page_title="Trial Overview", layout="wide")
 
-# Ensure URL reflects current page context
-if st.query_params.get("page") != "trial_overview":
-    st.query_params["page"] = "trial_overview"
+CRITERIA_PAGE_SIZE = 25
+TRIAL_DATA_CACHE_KEY = "_trial_data_cache"
+# Half the loaders' TTL: the loaders may hand back an entry up to
+# CACHE_TTL_SECONDS old, so data on screen is at most 1.5x that stale
+TRIAL_DATA_TTL_SECONDS = CACHE_TTL_SECONDS / 2
+RENDER_CACHE_KEY = "_render_cache"
 
 trial_param = st.query_params.get("trial")
 
+# URL state for this page, written once via sync_query_params
+url_state = {"page": "trial_overview"}
+if trial_param:
+    url_state["trial"] = trial_param
+
 # Header with refresh button
 col_title, col_refresh = st.columns([5, 1])
 with col_title:
@@ -26,12 +44,17 @@ with col_refresh:
     if st.button(
         "🔄 Refresh", width="stretch", help="Reload trials data from database"
     ):
-        st.rerun()
+        load_trials.clear()
+        load_trial_stats.clear()
+        load_criteria.clear()
+        st.session_state.pop(TRIAL_DATA_CACHE_KEY, None)
+        st.session_state.pop(RENDER_CACHE_KEY, None)
 
 # Load trials
 all_trials = load_trials()
 if not all_trials:
     st.warning("No trials found with criteria")
+    sync_query_params(url_state)
     st.stop()
 
 # Trial filters
@@ -71,6 +94,7 @@ if len(trials) < len(all_trials):
 
 if not trials:
     st.warning("No trials match the current filters")
+    sync_query_params(url_state)
     st.stop()
 
 st.markdown("---")
@@ -95,7 +119,6 @@ if st.session_state.trial_selector >= len(trials):
 trial_options = [
     f"{t['nct_id']} ({t['active']} active, {t['refined']} refined)" for t in trials
 ]
-print(f"Trial options: {trial_options}")
 selected_trial_idx = st.selectbox(
     "Select Trial",
     range(len(trials)),
@@ -105,11 +128,8 @@ selected_trial_idx = st.selectbox(
 )
 selected_trial = trials[selected_trial_idx]["nct_id"]
 
-print(f"Selected trial: {selected_trial}")
-if st.query_params.get("trial") != selected_trial:
-    st.query_params["trial"] = selected_trial
-
-print(f"Updated query params: {st.query_params}")
+url_state["trial"] = selected_trial
+sync_query_params(url_state)
 
 # Show inactive criteria toggle with session state
 if "show_inactive" not in st.session_state:
@@ -124,44 +144,71 @@ st.session_state.show_inactive = show_inactive
 
 st.subheader(f"Criteria for {selected_trial}")
 
-# Load and display criteria
-criteria = load_criteria(selected_trial, show_inactive, include_history=True)
+# Criteria, stats and the derived views are kept in session state per
+# (trial, show_inactive), so reruns from unrelated widgets skip rebuilding them;
+# they are reloaded once older than TRIAL_DATA_TTL_SECONDS
+data_key = (selected_trial, show_inactive)
+trial_data = st.session_state.get(TRIAL_DATA_CACHE_KEY)
+if (
+    trial_data is None
+    or trial_data["key"] != data_key
+    or time.monotonic() - trial_data["loaded_at"] >= TRIAL_DATA_TTL_SECONDS
+):
+    criteria = load_criteria(selected_trial, show_inactive, include_history=True)
+
+    # Active criteria snapshot
+    criteria_df = pd.DataFrame.from_records(
+        criteria,
+        columns=["id", "code", "text", "type", "category", "version", "is_active"],
+    )
+    snapshot_df = (
+        criteria_df[criteria_df["is_active"].astype(bool)]
+        .drop(columns="is_active")
+        .rename(
+            columns={
+                "id": "ID",
+                "code": "Code",
+                "text": "Text",
+                "type": "Type",
+                "category": "Category",
+                "version": "Version",
+            }
+        )
+        .sort_values(by=["Version", "Type", "ID"], ascending=[False, True, False])
+        .reset_index(drop=True)
+    )
+
+    trial_data = {
+        "key": data_key,
+        "loaded_at": time.monotonic(),
+        "criteria": criteria,
+        "stats": load_trial_stats(selected_trial, show_inactive),
+        "snapshot_df": snapshot_df,
+        "version_options": sorted({c["version"] for c in criteria}),
+        "category_options": sorted({c["category"] for c in criteria}),
+        "children_by_parent": Counter(
+            c["parent_id"] for c in criteria if c["parent_id"]
+        ),
+    }
+    st.session_state[TRIAL_DATA_CACHE_KEY] = trial_data
+
+criteria = trial_data["criteria"]
+stats = trial_data["stats"]
+snapshot_df = trial_data["snapshot_df"]
 
-# Statistics
+# Statistics (aggregated in SQL)
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    st.metric("Total Criteria", len(criteria))
+    st.metric("Total Criteria", stats["total"])
 with col2:
-    active_count = sum(1 for c in criteria if c["is_active"])
-    st.metric("Active", active_count)
+    st.metric("Active", stats["active"])
 with col3:
-    refined_count = sum(1 for c in criteria if c["version"] > 1)
-    st.metric("Refined (v>1)", refined_count)
+    st.metric("Refined (v>1)", stats["refined"])
 with col4:
-    split_count = sum(1 for c in criteria if c["parent_id"] is not None)
-    st.metric("Split from Parent", split_count)
-
-# Active criteria snapshot
-active_snapshot = [
-    {
-        "ID": c["id"],
-        "Code": c["code"],
-        "Text": c["text"],
-        "Type": c["type"],
-        "Category": c["category"],
-        "Version": c["version"],
-    }
-    for c in criteria
-    if c["is_active"]
-]
+    st.metric("Split from Parent", stats["split"])
 
-if active_snapshot:
+if not snapshot_df.empty:
     st.markdown("### Active Criteria Snapshot")
-    snapshot_df = (
-        pd.DataFrame(active_snapshot)
-        .sort_values(by=["Version", "Type", "ID"], ascending=[False, True, False])
-        .reset_index(drop=True)
-    )
     st.dataframe(
         snapshot_df,
         width="stretch",
@@ -188,7 +235,7 @@ col1, col2 = st.columns(2)
 with col1:
     version_filter = st.multiselect(
         "Version",
-        options=sorted({c["version"] for c in criteria}),
+        options=trial_data["version_options"],
         default=st.session_state.version_filter,
         key="version_filter_multiselect",
     )
@@ -196,33 +243,51 @@ with col1:
 with col2:
     category_filter = st.multiselect(
         "Category",
-        options=sorted({c["category"] for c in criteria}),
+        options=trial_data["category_options"],
         default=st.session_state.category_filter,
         key="category_filter_multiselect",
     )
     st.session_state.category_filter = category_filter
 
-# Apply filters
-filtered = criteria
-if version_filter:
-    filtered = [c for c in filtered if c["version"] in version_filter]
-if category_filter:
-    filtered = [c for c in filtered if c["category"] in category_filter]
-
-# Sort so refined criteria appear first, then by version/id descending
-filtered = sorted(
-    filtered,
-    key=lambda c: (
-        c["version"] <= 1,
-        -c["version"],
-        -c["id"],
-    ),
+# Apply filters, reusing the last result while the filter inputs are unchanged
+render_key = (
+    *data_key,
+    trial_data["loaded_at"],
+    tuple(version_filter),
+    tuple(category_filter),
 )
+render_cache = st.session_state.get(RENDER_CACHE_KEY)
+if render_cache is None or render_cache[0] != render_key:
+    filtered = criteria
+    if version_filter:
+        filtered = [c for c in filtered if c["version"] in version_filter]
+    if category_filter:
+        filtered = [c for c in filtered if c["category"] in category_filter]
+
+    # Sort by version then id, descending; refined (v>1) criteria come first
+    filtered = sorted(filtered, key=itemgetter("version", "id"), reverse=True)
+    render_cache = (render_key, filtered)
+    st.session_state[RENDER_CACHE_KEY] = render_cache
+filtered = render_cache[1]
+children_by_parent = trial_data["children_by_parent"]
 
 st.info(f"Showing {len(filtered)} of {len(criteria)} criteria")
 
+# Paginate so only one page of expanders is built per rerun
+page_count = max(1, math.ceil(len(filtered) / CRITERIA_PAGE_SIZE))
+if st.session_state.get("criteria_page", 1) > page_count:
+    st.session_state.criteria_page = 1
+page = st.number_input(
+    f"Page (of {page_count})",
+    min_value=1,
+    max_value=page_count,
+    step=1,
+    key="criteria_page",
+)
+page_start = (int(page) - 1) * CRITERIA_PAGE_SIZE
+
 # Display criteria in a table
-for criterion in filtered:
+for criterion in filtered[page_start : page_start + CRITERIA_PAGE_SIZE]:
     # Build expander title with status indicators
     title_parts = []
     title_parts.append("✅" if criterion["is_active"] else "❌")
@@ -242,95 +307,109 @@ for criterion in filtered:
     expander_title = " ".join(title_parts)
 
     with st.expander(expander_title):
-        # Main content
-        col1, col2 = st.columns([2, 1])
-
-        with col1:
-            st.markdown(f"**Text:** {criterion['text']}")
-            st.markdown(f"**Category:** {criterion['category']}")
-
-        with col2:
-            st.markdown(f"**Version:** {criterion['version']}")
-            st.markdown(f"**Active:** {criterion['is_active']}")
-            if criterion["parent_id"]:
-                st.markdown(
-                    "**Parent ID:** "
-                    f"[#{criterion['parent_id']}](?page=criterion_details&criterion_id={criterion['parent_id']})"
-                )
-
-        # Historical information section
-        st.markdown("---")
-        st.markdown("**📜 Historical Information**")
-
-        hist_col1, hist_col2 = st.columns(2)
-
-        with hist_col1:
-            st.caption(
-                f"🕐 Created: {criterion['created_at'].strftime('%Y-%m-%d %H:%M:%S')}"
+        # All static fields go out as one markdown element per criterion
+        summary_lines = [
+            f"**Text:** {criterion['text']}",
+            f"**Category:** {criterion['category']}",
+            (
+                f"**Version:** {criterion['version']} · "
+                f"**Active:** {criterion['is_active']}"
+            ),
+        ]
+        if criterion["parent_id"]:
+            summary_lines.append(
+                "**Parent ID:** "
+                f"[#{criterion['parent_id']}](?page=criterion_details&criterion_id={criterion['parent_id']})"
             )
 
-            # Count children
-            children_count = sum(
-                1 for c in criteria if c.get("parent_id") == criterion["id"]
+        created = criterion["created_at"].strftime("%Y-%m-%d %H:%M:%S")
+        history_lines = [f":gray[🕐 Created: {created}]"]
+        children_count = children_by_parent[criterion["id"]]
+        if children_count > 0:
+            history_lines.append(
+                f":gray[👶 Has {children_count} child{'ren' if children_count > 1 else ''} (split result)]"
             )
-            if children_count > 0:
-                st.caption(
-                    f"👶 Has {children_count} child{'ren' if children_count > 1 else ''} (split result)"
-                )
-
-        with hist_col2:
-            if criterion["version"] > 1:
-                st.caption(
-                    f"🔄 Refined {criterion['version'] - 1} time{'s' if criterion['version'] > 2 else ''}"
-                )
-            else:
-                st.caption("✨ Original (never refined)")
-
-        # Refinement reason
+        if criterion["version"] > 1:
+            history_lines.append(
+                f":gray[🔄 Refined {criterion['version'] - 1} time{'s' if criterion['version'] > 2 else ''}]"
+            )
+        else:
+            history_lines.append(":gray[✨ Original (never refined)]")
+
+        sections = [
+            "  \n".join(summary_lines),
+            "---",
+            "**📜 Historical Information**  \n" + "  \n".join(history_lines),
+        ]
         if criterion["reason"]:
-            st.info(f"**Last Refinement Reason:** {criterion['reason']}")
+            sections.append(f"**Last Refinement Reason:** {criterion['reason']}")
+        st.markdown("\n\n".join(sections))
 
         # Embedded change history
         changes = criterion.get("changes") or []
         if changes:
-            st.markdown("**📈 Change History**")
-            for idx, change in enumerate(changes, start=1):
-                change_title = (
-                    f"{idx}. {change.change_type.upper()} • "
-                    f"{change.changed_at.strftime('%Y-%m-%d %H:%M')}"
-                )
-                with st.expander(change_title, expanded=idx == 1):
-                    if change.reason:
-                        st.info(f"**Reason:** {change.reason}")
-
-                    diffs_rendered = False
-                    for field_name, label in [
-                        ("text", "Text"),
-                        ("code", "Code"),
-                        ("parsed_category", "Category"),
-                    ]:
-                        diff_html = render_field_diff(
-                            change.old_value, change.new_value, field_name
+            # History (and its diff HTML) is only built once the user asks for it
+            if st.toggle(
+                f"📈 Show change history ({len(changes)})",
+                key=f"show_history_{criterion['id']}",
+            ):
+                if criterion.get("history_truncated"):
+                    st.caption(
+                        f"Showing the latest {HISTORY_PREVIEW_LIMIT} changes. "
+                        "Open the full history below for older ones."
+                    )
+                for idx, change in enumerate(changes, start=1):
+                    change_title = (
+                        f"{idx}. {change['change_type'].upper()} • "
+                        f"{change['changed_at'].strftime('%Y-%m-%d %H:%M')}"
+                    )
+                    with st.expander(change_title, expanded=idx == 1):
+                        # Reason and field diffs share a single markdown element
+                        blocks = []
+                        diffs_rendered = False
+                        if change["reason"]:
+                            blocks.append(
+                                f"**Reason:** {html.escape(change['reason'])}"
+                            )
+                        # Expander bodies run even when collapsed, so only the
+                        # newest change builds its diffs without being asked
+                        show_diff = idx == 1 or st.toggle(
+                            "Show field diffs",
+                            key=f"show_diff_{criterion['id']}_{idx}",
                         )
-                        if diff_html:
-                            diffs_rendered = True
-                            st.markdown(f"**{label}:**")
-                            st.markdown(diff_html, unsafe_allow_html=True)
-
-                    if not diffs_rendered:
-                        st.caption("No field-level differences captured.")
-
-                    if change.old_value or change.new_value:
-                        with st.expander("View Raw JSON", expanded=False):
-                            raw_col1, raw_col2 = st.columns(2)
-                            with raw_col1:
-                                if change.old_value:
-                                    st.markdown("**Old Value:**")
-                                    st.json(change.old_value)
-                            with raw_col2:
-                                if change.new_value:
-                                    st.markdown("**New Value:**")
-                                    st.json(change.new_value)
+                        if show_diff:
+                            for field_name, label in [
+                                ("text", "Text"),
+                                ("code", "Code"),
+                                ("parsed_category", "Category"),
+                            ]:
+                                diff_html = render_field_diff(
+                                    change["old_value"],
+                                    change["new_value"],
+                                    field_name,
+                                )
+                                if diff_html:
+                                    diffs_rendered = True
+                                    blocks.append(f"**{label}:**")
+                                    blocks.append(diff_html)
+                            if not diffs_rendered:
+                                blocks.append(
+                                    ":gray[No field-level differences captured.]"
+                                )
+                        if blocks:
+                            st.markdown("\n\n".join(blocks), unsafe_allow_html=True)
+
+                        if change["old_value"] or change["new_value"]:
+                            with st.expander("View Raw JSON", expanded=False):
+                                raw_col1, raw_col2 = st.columns(2)
+                                with raw_col1:
+                                    if change["old_value"]:
+                                        st.markdown("**Old Value:**")
+                                        st.json(change["old_value"])
+                                with raw_col2:
+                                    if change["new_value"]:
+                                        st.markdown("**New Value:**")
+                                        st.json(change["new_value"])
         else:
             st.caption("No change history recorded yet.")
 
@@ -1,18 +1,46 @@
 """Shared utilities for Streamlit app."""
 
 import difflib
+import html
+import json
+from collections import defaultdict
 
-from sqlalchemy import case, cast, func
+from sqlalchemy import case, cast, event, func
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.types import Integer
 from sqlmodel import select, Session, create_engine, SQLModel
 import contextlib
 import functools
+import os
 
+import streamlit as st
 
-@functools.cache
+# Cached loaders return plain dicts so st.cache_data can pickle them cheaply.
+CACHE_TTL_SECONDS = 300
+
+# Most recent changes embedded per criterion by load_criteria(include_history=True)
+HISTORY_PREVIEW_LIMIT = 10
+
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    """Use WAL and memory-mapped reads on every new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
+@st.cache_resource
 def get_engine():
     """Get the database engine."""
-    return create_engine("sqlite:///test.db", echo=True)
+    engine = create_engine(
+        "sqlite:///test.db",
+        echo=bool(os.environ.get("SQL_ECHO")),
+        connect_args={"check_same_thread": False},
+    )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
 
 
 def create_db_and_tables(test_engine=None):
@@ -22,14 +50,85 @@ def create_db_and_tables(test_engine=None):
     db_engine = test_engine or get_engine()
     SQLModel.metadata.create_all(db_engine)
 
+    # create_all skips existing tables, so add indexes introduced since then
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db_engine, checkfirst=True)
+
+
+@st.cache_resource
+def ensure_schema() -> bool:
+    """Create missing tables and indexes once per server process."""
+    create_db_and_tables()
+    return True
+
+
+@st.cache_resource
+def get_sessionmaker():
+    """Get the shared session factory bound to the engine."""
+    return sessionmaker(bind=get_engine(), class_=Session, expire_on_commit=False)
+
 
 @contextlib.contextmanager
 def session_context():
     """Context manager to provide a session."""
-    with Session(get_engine()) as session:
+    with get_sessionmaker()() as session:
         yield session
 
 
+def sync_query_params(params: dict[str, str]) -> None:
+    """Replace the URL query params in one write, only when they differ."""
+    if st.query_params.to_dict() != params:
+        st.query_params.from_dict(params)
+
+
+def _decode_json_value(value):
+    """Decode a change value that was stored as a JSON string."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    return value
+
+
+def _change_to_dict(change) -> dict:
+    """Detach a change-history row into a plain dict.
+
+    Old/new values are decoded here once so renderers can treat them as dicts.
+    """
+    return {
+        "change_type": change.change_type,
+        "changed_at": change.changed_at,
+        "reason": change.reason,
+        "old_value": _decode_json_value(change.old_value),
+        "new_value": _decode_json_value(change.new_value),
+    }
+
+
+def _criteria_stat_columns(criteria_model):
+    """Aggregate columns shared by the trial list and per-trial statistics."""
+    return (
+        func.count().label("total_criteria"),
+        func.sum(cast(criteria_model.is_active, Integer)).label("active"),
+        func.sum(case((criteria_model.version > 1, 1), else_=0)).label("refined"),
+        func.sum(case((criteria_model.parent_id.isnot(None), 1), else_=0)).label(
+            "split"
+        ),
+    )
+
+
+def _stats_row_to_dict(row) -> dict:
+    """Convert an aggregate row into the stats dict used by the pages."""
+    return {
+        "total": row.total_criteria or 0,
+        "active": row.active or 0,
+        "refined": row.refined or 0,
+        "split": row.split or 0,
+    }
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
 def load_trials():
     from models import (
         CriteriaChangeHistory,
@@ -41,30 +140,32 @@ def load_trials():
         statement = (
             select(
                 ParsedEligibilityCriteria.nct_id,
-                func.count().label("total_criteria"),
-                func.sum(cast(ParsedEligibilityCriteria.is_active, Integer)).label(
-                    "active"
-                ),
-                func.sum(
-                    case((ParsedEligibilityCriteria.version > 1, 1), else_=0)
-                ).label("refined"),
+                *_criteria_stat_columns(ParsedEligibilityCriteria),
             )
             .group_by(ParsedEligibilityCriteria.nct_id)
             .order_by(ParsedEligibilityCriteria.nct_id)
         )
 
         results = session.exec(statement).all()
-        return [
-            {
-                "nct_id": r.nct_id,
-                "total": r.total_criteria,
-                "active": r.active or 0,
-                "refined": r.refined or 0,
-            }
-            for r in results
-        ]
+        return [{"nct_id": r.nct_id, **_stats_row_to_dict(r)} for r in results]
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def load_trial_stats(nct_id, show_inactive=False):
+    """Aggregate criteria counts for one trial, filtered like load_criteria."""
+    from models import ParsedEligibilityCriteria
+
+    with session_context() as session:
+        statement = select(*_criteria_stat_columns(ParsedEligibilityCriteria)).where(
+            ParsedEligibilityCriteria.nct_id == nct_id
+        )
+        if not show_inactive:
+            statement = statement.where(ParsedEligibilityCriteria.is_active)
 
+        return _stats_row_to_dict(session.exec(statement).one())
 
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
 def load_criteria(nct_id, show_inactive=False, include_history=False):
     """Load all criteria for a trial using SQLModel."""
     from models import (
@@ -73,102 +174,147 @@ def load_criteria(nct_id, show_inactive=False, include_history=False):
     )
 
     with session_context() as session:
-        statement = select(ParsedEligibilityCriteria).where(
-            ParsedEligibilityCriteria.nct_id == nct_id
-        )
+        # Plain column rows: no ORM identity map or instrumentation per criterion
+        statement = select(
+            ParsedEligibilityCriteria.id,
+            ParsedEligibilityCriteria.code,
+            ParsedEligibilityCriteria.text,
+            ParsedEligibilityCriteria.criterion_type.label("type"),
+            ParsedEligibilityCriteria.parsed_category.label("category"),
+            ParsedEligibilityCriteria.version,
+            ParsedEligibilityCriteria.parent_id,
+            ParsedEligibilityCriteria.refinement_reason.label("reason"),
+            ParsedEligibilityCriteria.is_active,
+            ParsedEligibilityCriteria.created_at,
+        ).where(ParsedEligibilityCriteria.nct_id == nct_id)
 
         if not show_inactive:
             statement = statement.where(ParsedEligibilityCriteria.is_active)
 
         statement = statement.order_by(ParsedEligibilityCriteria.id)
 
-        results = session.exec(statement).all()
+        criteria_list = [
+            dict(row._mapping)
+            for row in session.exec(statement.execution_options(yield_per=200))
+        ]
 
-        criteria_list = []
-        for r in results:
-            criterion_data = {
-                "id": r.id,
-                "code": r.code,
-                "text": r.text,
-                "type": (
-                    r.criterion_type.value
-                    if hasattr(r.criterion_type, "value")
-                    else r.criterion_type
-                ),
-                "category": r.parsed_category,
-                "version": r.version,
-                "parent_id": r.parent_id,
-                "reason": r.refinement_reason,
-                "is_active": r.is_active,
-                "created_at": r.created_at,
-            }
-
-            # Optionally load change history
-            if include_history:
-                changes_statement = (
-                    select(CriteriaChangeHistory)
-                    .where(CriteriaChangeHistory.criterion_id == r.id)
-                    .order_by(CriteriaChangeHistory.changed_at.desc())
+        if include_history:
+            # One query for the whole trial, keeping only the latest changes
+            ranked = (
+                select(
+                    CriteriaChangeHistory.criterion_id,
+                    CriteriaChangeHistory.change_type,
+                    CriteriaChangeHistory.changed_at,
+                    CriteriaChangeHistory.reason,
+                    CriteriaChangeHistory.old_value,
+                    CriteriaChangeHistory.new_value,
+                    func.row_number()
+                    .over(
+                        partition_by=CriteriaChangeHistory.criterion_id,
+                        order_by=CriteriaChangeHistory.changed_at.desc(),
+                    )
+                    .label("recency"),
+                )
+                .where(
+                    CriteriaChangeHistory.criterion_id.in_(
+                        [c["id"] for c in criteria_list]
+                    )
                 )
-                changes = session.exec(changes_statement).all()
-                criterion_data["changes"] = changes
+                .subquery()
+            )
+            changes_statement = (
+                select(*ranked.c)
+                # One extra row per criterion tells whether older changes exist
+                .where(ranked.c.recency <= HISTORY_PREVIEW_LIMIT + 1)
+                .order_by(ranked.c.criterion_id, ranked.c.changed_at.desc())
+                .execution_options(yield_per=200)
+            )
 
-            criteria_list.append(criterion_data)
+            changes_by_criterion: dict[int, list[dict]] = defaultdict(list)
+            for change in session.exec(changes_statement):
+                changes_by_criterion[change.criterion_id].append(
+                    _change_to_dict(change)
+                )
+            for criterion_data in criteria_list:
+                changes = changes_by_criterion.get(criterion_data["id"], [])
+                criterion_data["changes"] = changes[:HISTORY_PREVIEW_LIMIT]
+                criterion_data["history_truncated"] = (
+                    len(changes) > HISTORY_PREVIEW_LIMIT
+                )
 
         return criteria_list
 
 
+_DIFF_HUNK = (
+    '<div style="background-color: #e8f2ff; padding: 4px 8px;'
+    ' margin: 4px 0; font-family: monospace; color: #0969da;">'
+)
+_DIFF_DELETE = (
+    '<div style="background-color: #ffebe9; padding: 4px 8px;'
+    ' margin: 2px 0; font-family: monospace;">'
+    '<span style="color: #cf222e;">- '
+)
+_DIFF_INSERT = (
+    '<div style="background-color: #dafbe1; padding: 4px 8px;'
+    ' margin: 2px 0; font-family: monospace;">'
+    '<span style="color: #1a7f37;">+ '
+)
+_DIFF_CONTEXT = (
+    '<div style="padding: 4px 8px; margin: 2px 0;'
+    ' font-family: monospace; color: #656d76;"> '
+)
+_DIFF_SPAN_END = "</span></div>"
+_DIFF_END = "</div>"
+_DIFF_NO_CHANGES = (
+    '<div style="padding: 8px; color: #656d76;">No changes detected</div>'
+)
+
+
+def _unified_range(start: int, stop: int) -> str:
+    """Format a hunk range the way ``difflib.unified_diff`` does."""
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    return f"{start + 1 if length else start},{length}"
+
+
+def _diff_rows(opening: str, lines: list[str], closing: str):
+    """Wrap each escaped line in the given HTML opening/closing tags."""
+    return (opening + html.escape(line.rstrip()) + closing for line in lines)
+
+
+@functools.lru_cache(maxsize=4096)
 def render_diff(old_text: str | None, new_text: str | None) -> str:
-    """Render GitHub-style inline diff with color-coded changes."""
+    """Render GitHub-style inline diff with color-coded changes.
+
+    Memoized: the same change history is re-rendered on every rerun.
+    """
     if not old_text and not new_text:
         return ""
 
-    old_text = str(old_text) if old_text else ""
-    new_text = str(new_text) if new_text else ""
-
-    diff = difflib.unified_diff(
-        old_text.splitlines(keepends=True),
-        new_text.splitlines(keepends=True),
-        lineterm="",
-        n=3,
-    )
+    old_lines = str(old_text).splitlines() if old_text else []
+    new_lines = str(new_text).splitlines() if new_text else []
 
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
     diff_html: list[str] = []
-    for line in diff:
-        line = line.rstrip()
-        if line.startswith(("---", "+++")):
-            continue
-        if line.startswith("@@"):
-            diff_html.append(
-                '<div style="background-color: #e8f2ff; padding: 4px 8px;'
-                ' margin: 4px 0; font-family: monospace; color: #0969da;">'
-                f"{line}</div>"
-            )
-            continue
-        if line.startswith("-"):
-            diff_html.append(
-                '<div style="background-color: #ffebe9; padding: 4px 8px;'
-                ' margin: 2px 0; font-family: monospace;">'
-                f'<span style="color: #cf222e;">- {line[1:]}</span></div>'
-            )
-            continue
-        if line.startswith("+"):
-            diff_html.append(
-                '<div style="background-color: #dafbe1; padding: 4px 8px;'
-                ' margin: 2px 0; font-family: monospace;">'
-                f'<span style="color: #1a7f37;">+ {line[1:]}</span></div>'
-            )
-            continue
-        diff_html.append(
-            '<div style="padding: 4px 8px; margin: 2px 0;'
-            f' font-family: monospace; color: #656d76;">{line}</div>'
-        )
+    for group in matcher.get_grouped_opcodes(3):
+        old_range = _unified_range(group[0][1], group[-1][2])
+        new_range = _unified_range(group[0][3], group[-1][4])
+        diff_html.append(f"{_DIFF_HUNK}@@ -{old_range} +{new_range} @@{_DIFF_END}")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                diff_html.extend(_diff_rows(_DIFF_CONTEXT, old_lines[i1:i2], _DIFF_END))
+                continue
+            if tag in ("replace", "delete"):
+                diff_html.extend(
+                    _diff_rows(_DIFF_DELETE, old_lines[i1:i2], _DIFF_SPAN_END)
+                )
+            if tag in ("replace", "insert"):
+                diff_html.extend(
+                    _diff_rows(_DIFF_INSERT, new_lines[j1:j2], _DIFF_SPAN_END)
+                )
 
-    return (
-        "".join(diff_html)
-        if diff_html
-        else '<div style="padding: 8px; color: #656d76;">No changes detected</div>'
-    )
+    return "".join(diff_html) if diff_html else _DIFF_NO_CHANGES
 
 
 def render_field_diff(
@@ -181,7 +327,10 @@ def render_field_diff(
     if old_field == new_field:
         return None
 
-    return render_diff(old_field, new_field)
+    # JSON values may be unhashable; render_diff stringifies them anyway.
+    return render_diff(
+        str(old_field) if old_field else None, str(new_field) if new_field else None
+    )
 
 
 def load_criterion_history(criterion_id):
@@ -191,7 +340,6 @@ def load_criterion_history(criterion_id):
         ParsedEligibilityCriteria,
     )
 
-    create_db_and_tables()
     with session_context() as session:
         # Get criterion details
         criterion = session.get(ParsedEligibilityCriteria, criterion_id)
@@ -205,11 +353,21 @@ def load_criterion_history(criterion_id):
             .where(CriteriaChangeHistory.criterion_id == criterion_id)
             .order_by(CriteriaChangeHistory.changed_at.desc())
         )
-        changes = session.exec(changes_statement).all()
+        changes = [
+            _change_to_dict(change) for change in session.exec(changes_statement)
+        ]
 
-        # Get children if split
+        # Get children if split, as plain (id, code, text, category, version,
+        # is_active) rows ready for a DataFrame
         children_statement = (
-            select(ParsedEligibilityCriteria)
+            select(
+                ParsedEligibilityCriteria.id,
+                ParsedEligibilityCriteria.code,
+                ParsedEligibilityCriteria.text,
+                ParsedEligibilityCriteria.parsed_category,
+                ParsedEligibilityCriteria.version,
+                ParsedEligibilityCriteria.is_active,
+            )
             .where(ParsedEligibilityCriteria.parent_id == criterion_id)
             .order_by(ParsedEligibilityCriteria.id)
         )